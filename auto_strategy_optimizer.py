@@ -1,12 +1,48 @@
 import pandas as pd
 import numpy as np
 import akshare as ak
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime
 import os
+import csv
+import json
+from numpy.lib.stride_tricks import sliding_window_view
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import product
+from math import prod
 from tqdm import tqdm
+from joblib import Parallel, delayed
+from stock_cache import get_hist, cached_call
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import bottleneck as bn  # C实现的滚动窗口函数（可选依赖）
+except ImportError:
+    bn = None
+
+try:
+    import talib  # TA-Lib的C实现技术指标（可选依赖）
+except ImportError:
+    talib = None
+
+try:
+    from numba import njit  # 回测内核JIT编译（可选依赖）
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    
+    def njit(*args, **kwargs):
+        """未安装numba时原样返回函数（纯Python执行，结果一致）"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# 调试输出（设置环境变量STRATEGY_DEBUG=1开启，打印每只股票评分明细）
+DEBUG = os.environ.get("STRATEGY_DEBUG", "0") == "1"
+
 # ====================== 精准配置（权衡时间+准确度）======================
 STOCK_FILTER_CONFIG = {
     "min_market_cap": 500,  # 大盘股筛选（稳定性高）
@@ -14,7 +50,10 @@ STOCK_FILTER_CONFIG = {
     "exclude_st": True,
     "exclude_delisted": True,
     "stock_pool": "沪深A股",
-    "max_stock_count": 200  # 限制筛选数量（避免运行过久）
+    "max_stock_count": 200,  # 限制筛选数量（避免运行过久）
+    # 预筛排名权重：超出数量限制时，按实时行情各字段的百分位排名加权，只对前N只下载历史数据评分
+    "prefilter_weights": {"成交额_亿": 0.5, "量比": 0.25, "涨跌幅": 0.25},
+    "score_workers": 24      # 评分并发线程数（网络IO为主）
 }
 
 # 扩大参数组合（从1组→60组，提升优化精度）
@@ -26,8 +65,25 @@ PARAM_SEARCH_CONFIG = {
     "SELL_MARGIN": [0.008, 0.01, 0.012] # 卖出容忍度
 }
 
+# 参数搜索方式："grid"=全量网格，"random"=随机抽样，"coarse2fine"=随机粗搜+最优组合邻域细搜，
+# "bayes"=贝叶斯优化（optuna TPE，在各参数候选值的最小~最大范围内连续搜索，需安装optuna）
+SEARCH_CONFIG = {
+    "mode": "grid",
+    "random_samples": 60,  # random模式抽样组合数
+    "coarse_samples": 30,  # coarse2fine模式粗搜组合数
+    "bayes_trials": 150,   # bayes模式回测次数
+    "bayes_startup": 30,   # bayes模式前N次为随机探索
+    "screen_quantile": 0.25,  # 预筛：先只回测第一只股票，评分处于后25%的组合不再回测其余股票（0=关闭）
+    "seed": 0,             # 随机种子（保证结果可复现）
+    # 回测次数（组合数×股票数）达到该值才启用多进程：单次回测仅几十微秒，
+    # 而每个子进程启动时需重新导入pandas/numba/pyarrow/akshare（0.5秒以上），小规模搜索串行更快
+    "parallel_min_backtests": 100000,
+    "batch_size": 32,      # 并行回测时每次派发给进程的组合数（减少调度开销）
+    "max_nbytes": "50M"    # 超过该大小的行情数组自动memmap共享给子进程
+}
+
 BACKTEST_CONFIG = {
-    "history_days": 180,  # 回溯周期（180天=6个月，兼顾短期趋势+数据量）
+    "history_days": 180,  # 回溯周期（180个交易日，兼顾短期趋势+数据量）
     "transaction_cost": 0.0015,  # 真实交易成本（印花税+佣金）
     "score_weights": {
         "annual_return": 0.6,    # 收益率权重最高
@@ -44,9 +100,74 @@ OUTPUT_CONFIG = {
 
 LOG_DIR = "strategy_log"
 os.makedirs(LOG_DIR, exist_ok=True)
-PARAM_LOG_PATH = os.path.join(LOG_DIR, "param_optimization_log.csv")
+PARAM_LOG_PATH = os.path.join(LOG_DIR, "param_opt.parquet")  # Parquet数据集，按优化日期分区
+LEGACY_PARAM_LOG_PATH = os.path.join(LOG_DIR, "param_optimization_log.csv")  # 旧版CSV参数日志（只读，用于恢复进度）
 STOCK_LOG_PATH = os.path.join(LOG_DIR, "stock_selection_log.csv")
 SIGNAL_LOG_PATH = os.path.join(LOG_DIR, "trading_signals.csv")
+PROGRESS_PATH = os.path.join(LOG_DIR, "_progress.json")  # 已优化日期列表（月度进度）
+
+def _append_csv(path, rows, fieldnames):
+    """追加写入日志行（文件不存在时先写表头），小批量写入无需经过DataFrame"""
+    if not rows:
+        return
+    write_header = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        if write_header:
+            writer.writeheader()
+        writer.writerows(rows)
+
+def _progress(iterable, total, desc):
+    """节流的进度条：至少间隔1秒、全程最多约200次刷新，避免频繁终端输出拖慢循环"""
+    return tqdm(iterable, total=total, desc=desc, mininterval=1.0, miniters=max(1, total // 200))
+
+# ====================== 滚动窗口计算（等价于rolling(window, min_periods=1)）======================
+def _window_view(a, window):
+    """头部补NaN后的滑动窗口视图（bottleneck不可用时的后备实现）"""
+    padded = np.concatenate([np.full(window - 1, np.nan), np.asarray(a, dtype=np.float64)])
+    return sliding_window_view(padded, window)
+
+def _move_mean(a, window):
+    """滚动均值"""
+    if bn is not None:
+        return bn.move_mean(a, window, min_count=1)
+    return np.nanmean(_window_view(a, window), axis=-1)
+
+def _move_min(a, window):
+    """滚动最小值"""
+    if bn is not None:
+        return bn.move_min(a, window, min_count=1)
+    return np.nanmin(_window_view(a, window), axis=-1)
+
+# ====================== 行情数据（评分/回测/信号共用一次下载）======================
+def _prep_arrays(code, df):
+    """前后向填充后转为float64数组（缓存为float32，计算统一用float64）；数组设为只读，供多处共享"""
+    df = df.ffill().bfill()
+    arrays = {
+        "close": df["收盘"].to_numpy(np.float64),
+        "high": df["最高"].to_numpy(np.float64),
+        "low": df["最低"].to_numpy(np.float64),
+        "volume": df["成交量"].to_numpy(np.float64),
+        "turnover": df["换手率"].to_numpy(np.float64) if "换手率" in df.columns else None
+    }
+    for values in arrays.values():
+        if values is not None:
+            values.setflags(write=False)
+    arrays["code"] = code
+    return arrays
+
+@lru_cache(maxsize=512)
+def load_prepped(code, days=None):
+    """按股票代码缓存最近days个交易日的预处理数组（前复权），调用方按需截取末尾数据"""
+    if days is None:
+        # 覆盖评分（120天）和回测（回溯周期+10天缓冲）所需的最长窗口
+        days = max(120, BACKTEST_CONFIG["history_days"] + 10)
+    df = get_hist(code, adjust="qfq").tail(days).reset_index(drop=True)
+    return _prep_arrays(code, df)
+
+def _tail(arrays, n):
+    """截取预处理数组的最近n个交易日（返回视图，不复制数据）"""
+    return {k: (v[-n:] if isinstance(v, np.ndarray) else v) for k, v in arrays.items()}
 
 # ====================== 工具函数（精准增强）======================
 def get_tradable_stocks():
@@ -54,35 +175,43 @@ def get_tradable_stocks():
     print("📊 正在筛选可交易股票池...（精准模式）")
     try:
         # 1. 获取全市场股票信息+实时行情
-        stock_info = ak.stock_info_a_code_name()  # 股票代码+名称
-        stock_quote = ak.stock_zh_a_spot_em()     # 实时行情（成交额、市值等）
+        stock_info = cached_call("code_name", ak.stock_info_a_code_name, ttl="1d")  # 股票代码+名称（盘中不变，缓存1天）
+        stock_quote = cached_call("spot_em", ak.stock_zh_a_spot_em, ttl=600)   # 实时行情（成交额、市值等，缓存10分钟）
         
-        # 2. 数据合并+清洗
+        # 2. 数据合并+清洗（两侧代码转为同一类别集合的categorical，按整数编码合并）
+        code_dtype = pd.CategoricalDtype(pd.concat([stock_info["code"], stock_quote["代码"]]).unique())
+        stock_info = stock_info.assign(code=stock_info["code"].astype(code_dtype))
+        stock_quote = stock_quote[["代码", "最新价", "成交额", "总市值", "涨跌幅", "量比"]]
+        stock_quote = stock_quote.assign(代码=stock_quote["代码"].astype(code_dtype))
         stock_df = pd.merge(
-            stock_info,
-            stock_quote[["代码", "最新价", "成交额", "总市值", "涨跌幅"]],
+            stock_info, stock_quote,
             left_on="code", right_on="代码", how="inner"
         ).drop("代码", axis=1)
+        stock_df["code"] = stock_df["code"].astype(str)
         
         # 3. 单位转换（元→亿，确保筛选准确）
         stock_df["成交额_亿"] = stock_df["成交额"] / 10000
         stock_df["总市值_亿"] = stock_df["总市值"] / 100000000
         
-        # 4. 核心筛选条件
+        # 4. 核心筛选条件（ST/退市用一次正则扫描）
+        bad_name = stock_df["name"].str.contains(r"ST|退市", regex=True, na=False)
         filter_mask = (
             (stock_df["总市值_亿"] >= STOCK_FILTER_CONFIG["min_market_cap"]) &
             (stock_df["成交额_亿"] >= STOCK_FILTER_CONFIG["min_avg_volume"]) &
-            (~stock_df["name"].str.contains("ST", na=False)) &
-            (~stock_df["name"].str.contains("退市", na=False))
+            ~bad_name
         )
         tradable_stocks = stock_df[filter_mask].copy()
         
         # 5. 限制数量（避免运行过久）
         if len(tradable_stocks) > STOCK_FILTER_CONFIG["max_stock_count"]:
-            # 按成交额排序，取前N只（流动性最优）
-            tradable_stocks = tradable_stocks.nlargest(
-                STOCK_FILTER_CONFIG["max_stock_count"], "成交额_亿"
-            ).reset_index(drop=True)
+            # 实时行情预筛：流动性（成交额）+ 当日放量（量比）+ 当日强势（涨跌幅）加权排名，取前N只
+            prefilter_score = sum(
+                tradable_stocks[col].rank(pct=True).fillna(0) * weight
+                for col, weight in STOCK_FILTER_CONFIG["prefilter_weights"].items()
+            )
+            tradable_stocks = tradable_stocks.loc[
+                prefilter_score.nlargest(STOCK_FILTER_CONFIG["max_stock_count"]).index
+            ].reset_index(drop=True)
         
         print(f"✅ 筛选完成！可交易股票池共{len(tradable_stocks)}只（精准模式）")
         return tradable_stocks[["code", "name", "总市值_亿", "成交额_亿", "涨跌幅"]]
@@ -98,55 +227,65 @@ def get_tradable_stocks():
         })
         return preset_stocks
 
+@njit(cache=True)
+def _rsi_wilder(close, n=14):
+    """Wilder平滑RSI（alpha=1/n），单次遍历返回最新一日的RSI值"""
+    if close.size <= n:
+        return np.nan
+    gain = 0.0
+    loss = 0.0
+    for i in range(1, n + 1):
+        d = close[i] - close[i - 1]
+        gain += max(d, 0.0)
+        loss += max(-d, 0.0)
+    gain /= n
+    loss /= n
+    for i in range(n + 1, close.size):
+        d = close[i] - close[i - 1]
+        gain = (gain * (n - 1) + max(d, 0.0)) / n
+        loss = (loss * (n - 1) + max(-d, 0.0)) / n
+    if loss == 0:
+        return 100.0
+    return 100 - 100 / (1 + gain / loss)
+
+def _latest_rsi(close, n=14):
+    """最新一日RSI（Wilder平滑）：优先使用TA-Lib，未安装时使用编译内核"""
+    if talib is not None:
+        return float(talib.RSI(close, timeperiod=n)[-1])
+    return _rsi_wilder(close, n)
+
 def calculate_short_term_score(stock_code):
     """增强评分逻辑：增加因子有效性校验，提升区分度"""
     try:
-        # 获取120天数据（足够计算180天回溯内的所有因子）
-        df = ak.stock_zh_a_hist(
-            symbol=stock_code,
-            period="daily",
-            adjust="qfq"  # 前复权（确保价格连续性）
-        ).tail(120).reset_index(drop=True)
+        # 取最近120天数据（足够计算所有评分因子，前复权确保价格连续性）
+        arrays = _tail(load_prepped(stock_code), 120)
+        close, volume, turnover = arrays["close"], arrays["volume"], arrays["turnover"]
         
-        if len(df) < 60:  # 至少60天数据（确保因子稳定性）
+        if len(close) < 60:  # 至少60天数据（确保因子稳定性）
             print(f"⚠️ {stock_code} 数据不足60条，评分设为0")
             return 0
         
-        # 填充缺失值（提升数据质量）
-        df = df.fillna(method="ffill").fillna(method="bfill")
-        
         # 因子1：近5日涨幅（权重0.3）- 反映短期趋势
-        if len(df) >= 6:
-            recent_5d_return = (df.iloc[-1]["收盘"] - df.iloc[-6]["收盘"]) / df.iloc[-6]["收盘"]
-        else:
-            recent_5d_return = 0
+        recent_5d_return = (close[-1] - close[-6]) / close[-6]
         return_score = min(max(recent_5d_return * 150, 0), 30)  # 0-30分（区分度更高）
         
         # 因子2：成交量放大率（权重0.2）- 反映资金关注度
-        recent_5d_volume = df.iloc[-5:]["成交量"].mean()
-        recent_20d_volume = df.iloc[-20:]["成交量"].rolling(window=20, min_periods=1).mean().iloc[-1]
+        recent_5d_volume = volume[-5:].mean()
+        recent_20d_volume = volume[-20:].mean()
         volume_ratio = recent_5d_volume / recent_20d_volume if recent_20d_volume > 0 else 0
         volume_score = min(max((volume_ratio - 0.5) * 20, 0), 20)  # 0.5倍以上才得分，0-20分
         
-        # 因子3：均线多头排列（权重0.2）- 反映中期趋势
-        df["ma5"] = df["收盘"].rolling(window=5, min_periods=1).mean()
-        df["ma10"] = df["收盘"].rolling(window=10, min_periods=1).mean()
-        df["ma20"] = df["收盘"].rolling(window=20, min_periods=1).mean()
-        df["ma60"] = df["收盘"].rolling(window=60, min_periods=1).mean()
-        latest_ma5 = df.iloc[-1]["ma5"]
-        latest_ma10 = df.iloc[-1]["ma10"]
-        latest_ma20 = df.iloc[-1]["ma20"]
-        latest_ma60 = df.iloc[-1]["ma60"]
+        # 因子3：均线多头排列（权重0.2）- 反映中期趋势（只需最新一日均线，直接取末尾窗口均值）
+        latest_ma5 = close[-5:].mean()
+        latest_ma10 = close[-10:].mean()
+        latest_ma20 = close[-20:].mean()
+        latest_ma60 = close[-60:].mean()
         # 严格多头排列：ma5>ma10>ma20>ma60
         ma排列 = latest_ma5 > latest_ma10 > latest_ma20 > latest_ma60 > 0
         ma_score = 20 if ma排列 else min(max((latest_ma5 - latest_ma20)/latest_ma20 * 200, 0), 15)
         
         # 因子4：RSI（14日）（权重0.15）- 避免超买超卖
-        delta = df["收盘"].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14, min_periods=1).mean().iloc[-1]
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean().iloc[-1]
-        rs = gain / loss if loss > 0 else 0
-        rsi14 = 100 - (100 / (1 + rs)) if rs >= 0 else 0
+        rsi14 = _latest_rsi(close, 14)
         # RSI在50-70之间得分最高（中性偏强）
         if 50 <= rsi14 <= 70:
             rsi_score = 15
@@ -156,9 +295,9 @@ def calculate_short_term_score(stock_code):
             rsi_score = 3
         
         # 因子5：换手率稳定性（权重0.15）- 反映交易活跃度
-        if "换手率" in df.columns and not df["换手率"].isna().all():
-            turnover_5d = df.iloc[-5:]["换手率"].mean()
-            turnover_20d = df.iloc[-20:]["换手率"].mean()
+        if turnover is not None and not np.isnan(turnover).all():
+            turnover_5d = turnover[-5:].mean()
+            turnover_20d = turnover[-20:].mean()
             turnover_stability = min(max(1 - abs(turnover_5d - turnover_20d)/turnover_20d, 0), 1)
             turnover_score = turnover_stability * 15  # 0-15分
         else:
@@ -173,8 +312,9 @@ def calculate_short_term_score(stock_code):
             turnover_score * 0.15
         )
         
-        # 调试信息（可选关闭）
-        print(f"📊 {stock_code} 评分明细：涨幅{return_score:.1f} | 成交量{volume_score:.1f} | 均线{ma_score:.1f} | RSI{rsi_score:.1f} | 换手率{turnover_score:.1f} | 总分{total_score:.1f}")
+        # 调试信息（默认关闭，避免刷屏打断进度条）
+        if DEBUG:
+            print(f"📊 {stock_code} 评分明细：涨幅{return_score:.1f} | 成交量{volume_score:.1f} | 均线{ma_score:.1f} | RSI{rsi_score:.1f} | 换手率{turnover_score:.1f} | 总分{total_score:.1f}")
         
         return round(total_score, 2)
     except Exception as e:
@@ -186,31 +326,33 @@ def select_top5_stocks():
     print("\n🎯 正在评选短线潜力股（前5名）...（精准模式）")
     tradable_stocks = get_tradable_stocks()
     
-    # 计算所有筛选股票的评分
-    scores = []
-    for idx, row in tqdm(tradable_stocks.iterrows(), total=len(tradable_stocks), desc="计算股票评分"):
-        score = calculate_short_term_score(row["code"])
-        scores.append(score)
+    # 计算所有筛选股票的评分（网络IO为主，多线程并发请求行情）
+    with ThreadPoolExecutor(max_workers=STOCK_FILTER_CONFIG["score_workers"]) as executor:
+        scores = list(_progress(
+            executor.map(calculate_short_term_score, tradable_stocks["code"]),
+            total=len(tradable_stocks), desc="计算股票评分"
+        ))
     
     tradable_stocks["短线评分"] = scores
     
     # 筛选前5只高分股票（评分≥30分才纳入，避免垃圾股）
-    top5_stocks = tradable_stocks[tradable_stocks["短线评分"] >= 30].nlargest(
-        OUTPUT_CONFIG["top_stock_count"], "短线评分"
-    ).reset_index(drop=True)
+    top_count = OUTPUT_CONFIG["top_stock_count"]
+    top_stocks = tradable_stocks[tradable_stocks["短线评分"] >= 30].nlargest(top_count, "短线评分")
+    pieces = [top_stocks]
+    selected_count = len(top_stocks)
     
     # 若不足5只，用次高分补充（最低≥20分）
-    if len(top5_stocks) < OUTPUT_CONFIG["top_stock_count"]:
-        fill_count = OUTPUT_CONFIG["top_stock_count"] - len(top5_stocks)
+    if selected_count < top_count:
         fill_stocks = tradable_stocks[
             (tradable_stocks["短线评分"] >= 20) & 
-            (~tradable_stocks["code"].isin(top5_stocks["code"]))
-        ].nlargest(fill_count, "短线评分").reset_index(drop=True)
-        top5_stocks = pd.concat([top5_stocks, fill_stocks], ignore_index=True)
+            (~tradable_stocks["code"].isin(top_stocks["code"]))
+        ].nlargest(top_count - selected_count, "短线评分")
+        pieces.append(fill_stocks)
+        selected_count += len(fill_stocks)
     
     # 确保刚好5只（极端情况用预设股票填充）
-    if len(top5_stocks) < OUTPUT_CONFIG["top_stock_count"]:
-        fill_count = OUTPUT_CONFIG["top_stock_count"] - len(top5_stocks)
+    if selected_count < top_count:
+        fill_count = top_count - selected_count
         preset_codes = ["601899", "600519", "000651", "600028", "601988"]
         preset_names = ["紫金矿业", "贵州茅台", "格力电器", "中国石化", "中国银行"]
         fill_df = pd.DataFrame({
@@ -221,115 +363,306 @@ def select_top5_stocks():
             "涨跌幅": [0]*fill_count,
             "短线评分": [25]*fill_count
         })
-        top5_stocks = pd.concat([top5_stocks, fill_df], ignore_index=True)
+        pieces.append(fill_df)
+    
+    # 各部分只合并一次
+    top5_stocks = pd.concat(pieces, ignore_index=True).head(top_count)
     
     # 保存选股日志
     top5_stocks["选股日期"] = datetime.now().strftime("%Y-%m-%d")
-    top5_stocks.to_csv(STOCK_LOG_PATH, mode="a", header=not os.path.exists(STOCK_LOG_PATH), index=False)
+    _append_csv(STOCK_LOG_PATH, top5_stocks.to_dict("records"), list(top5_stocks.columns))
     
     print(f"\n🏆 短线潜力股TOP5：")
     for idx, row in top5_stocks.iterrows():
         print(f"{idx+1}. {row['code']} {row['name']} | 市值：{row['总市值_亿']:.1f}亿 | 成交额：{row['成交额_亿']:.1f}亿 | 评分：{row['短线评分']:.1f}")
     return top5_stocks
 
-def backtest_strategy(stock_code, params):
-    """增强回测逻辑：增加止损逻辑，提升真实性"""
+def _signal_arrays(close, ma_s, ma_l, support, buy_margin):
+    """向量化生成买卖信号（bool数组，沿最后一维为时间；首日无前值不产生信号）"""
+    ma_s_prev = np.roll(ma_s, 1, axis=-1)
+    ma_l_prev = np.roll(ma_l, 1, axis=-1)
+    # 金叉+靠近支撑位买入（避免在支撑位下方买入）
+    buy = np.logical_and.reduce([
+        ma_s_prev < ma_l_prev,
+        ma_s > ma_l,
+        close <= support * (1 + buy_margin),
+        close > support * 0.95
+    ])
+    # 死叉卖出，或跌破支撑位1.5%止损
+    sell = np.logical_or(
+        np.logical_and(ma_s_prev > ma_l_prev, ma_s < ma_l),
+        close < support * 0.985
+    )
+    buy[..., 0] = False
+    sell[..., 0] = False
+    return buy, sell
+
+@njit(cache=True)
+def _run_backtest(close, buy, sell, buy_margin, sell_margin, tcost):
+    """按信号模拟交易（单只股票满仓），返回每笔交易扣除成本后的收益率"""
+    n = close.size
+    returns = np.empty(n)
+    n_trades = 0
+    position = 0  # 0=空仓，1=持仓
+    buy_price = 0.0
+    
+    for i in range(n):
+        if buy[i] and position == 0:
+            buy_price = close[i] * (1 + buy_margin)
+            position = 1
+        elif sell[i] and position == 1:
+            sell_price = close[i] * (1 - sell_margin)
+            net_buy = buy_price * (1 + tcost)
+            net_sell = sell_price * (1 - tcost)
+            returns[n_trades] = (net_sell - net_buy) / net_buy
+            n_trades += 1
+            position = 0
+    
+    return returns[:n_trades]
+
+def _warmup_backtest_kernel():
+    """主进程先编译回测内核并写入磁盘缓存（cache=True），并行子进程直接加载，不再各自编译"""
+    if not HAS_NUMBA:
+        return
+    # 参数类型与子进程收到的数据一致（反序列化后的可写float64数组、bool信号、float参数）
+    close = np.ones(2)
+    flags = np.zeros(2, dtype=np.bool_)
+    _run_backtest(close, flags, flags, 0.01, 0.01, BACKTEST_CONFIG["transaction_cost"])
+
+def _simulate_trades_vectorized(close, buy, sell, buy_margin, sell_margin, tcost):
+    """
+    纯NumPy交易模拟（未安装numba时替代_run_backtest，结果一致）
+    买卖信号不会出现在同一天（金叉/死叉互斥，收盘价不低于支撑位），
+    空仓只响应买入、持仓只响应卖出，等价于对信号序列去重后买卖交替配对
+    """
+    state = np.where(buy, 1, np.where(sell, -1, 0))
+    event_idx = np.flatnonzero(state)
+    events = state[event_idx]
+    # 去掉与上一信号相同的重复信号；首个信号为卖出时（空仓）一并去掉
+    prev_events = np.concatenate(([-1], events[:-1]))
+    trade_idx = event_idx[events != prev_events]
+    exits = trade_idx[1::2]
+    entries = trade_idx[0::2][:exits.size]  # 最后一笔未平仓的买入不计
+    net_buy = close[entries] * (1 + buy_margin) * (1 + tcost)
+    net_sell = close[exits] * (1 - sell_margin) * (1 - tcost)
+    return (net_sell - net_buy) / net_buy
+
+def _prep_backtest_arrays(code):
+    """回测用行情：截取回溯区间并校验数据完整性，在参数循环外每只股票只做一次"""
+    # 180个交易日回溯数据（含10天缓冲）
+    arrays = _tail(load_prepped(code), BACKTEST_CONFIG["history_days"] + 10)
+    if len(arrays["close"]) < BACKTEST_CONFIG["history_days"] * 0.8:  # 至少80%数据完整性
+        print(f"⚠️ {code} 回测数据不足，跳过")
+        return None
+    close, low = arrays["close"], arrays["low"]
+    # 各候选窗口的均线/支撑位只算一次，全部参数组合共用
+    ma_windows = set(PARAM_SEARCH_CONFIG["MA_SHORT"]) | set(PARAM_SEARCH_CONFIG["MA_LONG"])
+    # 只保留回测用到的数据，减少分发给并行进程的数据量
+    return {
+        "code": code,
+        "close": close,
+        "low": low,
+        "ma": {n: _move_mean(close, n) for n in ma_windows},
+        "support": {n: _move_min(low, n) for n in PARAM_SEARCH_CONFIG["SUPPORT_RESIST_DAYS"]}
+    }
+
+def _indicator(arrays, kind, window):
+    """读取预计算的均线（ma）/支撑位（support），不在候选窗口内时现算"""
+    cached = arrays[kind].get(window)
+    if cached is not None:
+        return cached
+    if kind == "ma":
+        return _move_mean(arrays["close"], window)
+    return _move_min(arrays["low"], window)
+
+def backtest_strategy(arrays, params):
+    """增强回测逻辑：增加止损逻辑，提升真实性（arrays为_prep_backtest_arrays预处理结果）"""
     try:
-        # 180天回溯数据（含前后各10天缓冲）
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=BACKTEST_CONFIG["history_days"] + 10)
-        df = ak.stock_zh_a_hist(
-            symbol=stock_code,
-            period="daily",
-            start_date=start_date.strftime("%Y-%m-%d"),
-            end_date=end_date.strftime("%Y-%m-%d"),
-            adjust="qfq"
-        ).reset_index(drop=True)
-        
-        if len(df) < BACKTEST_CONFIG["history_days"] * 0.8:  # 至少80%数据完整性
-            return None
+        close = arrays["close"]
         
-        # 数据预处理
-        df = df.fillna(method="ffill").fillna(method="bfill")
-        df["ma_short"] = df["收盘"].rolling(window=params["MA_SHORT"], min_periods=1).mean()
-        df["ma_long"] = df["收盘"].rolling(window=params["MA_LONG"], min_periods=1).mean()
-        df["support"] = df["最低"].rolling(window=params["SUPPORT_RESIST_DAYS"], min_periods=1).min()
-        df["resistance"] = df["最高"].rolling(window=params["SUPPORT_RESIST_DAYS"], min_periods=1).max()
+        # 指标读取（已在参数循环外预计算）
+        ma_short = _indicator(arrays, "ma", params["MA_SHORT"])
+        ma_long = _indicator(arrays, "ma", params["MA_LONG"])
+        support = _indicator(arrays, "support", params["SUPPORT_RESIST_DAYS"])
         
         # 信号生成（增加止损条件：跌破支撑位1.5%止损）
-        df["buy_signal"] = (
-            df["ma_short"].shift(1) < df["ma_long"].shift(1) &
-            df["ma_short"] > df["ma_long"] &
-            df["收盘"] <= df["support"] * (1 + params["BUY_MARGIN"]) &
-            df["收盘"] > df["support"] * 0.95  # 避免在支撑位下方买入
-        )
-        df["sell_signal"] = (
-            (df["ma_short"].shift(1) > df["ma_long"].shift(1) & df["ma_short"] < df["ma_long"]) |
-            (df["收盘"] < df["support"] * 0.985)  # 止损信号
-        )
-        
-        # 模拟交易（单只股票满仓，记录每次交易）
-        position = 0  # 0=空仓，1=持仓
-        buy_price = 0
-        trades = []
+        buy_signal, sell_signal = _signal_arrays(close, ma_short, ma_long, support, params["BUY_MARGIN"])
         
-        for idx, row in df.iterrows():
-            if row["buy_signal"] and position == 0:
-                buy_price = row["收盘"] * (1 + params["BUY_MARGIN"])
-                position = 1
-                buy_date = row["日期"]
-            elif row["sell_signal"] and position == 1:
-                sell_price = row["收盘"] * (1 - params["SELL_MARGIN"])
-                # 计算收益率（扣除交易成本）
-                net_buy = buy_price * (1 + BACKTEST_CONFIG["transaction_cost"])
-                net_sell = sell_price * (1 - BACKTEST_CONFIG["transaction_cost"])
-                return_rate = (net_sell - net_buy) / net_buy
-                trades.append({
-                    "buy_date": buy_date,
-                    "sell_date": row["日期"],
-                    "buy_price": buy_price,
-                    "sell_price": sell_price,
-                    "return_rate": return_rate
-                })
-                position = 0
+        # 模拟交易（优先使用编译内核）
+        simulate = _run_backtest if HAS_NUMBA else _simulate_trades_vectorized
+        returns = simulate(
+            close, buy_signal, sell_signal,
+            params["BUY_MARGIN"], params["SELL_MARGIN"], BACKTEST_CONFIG["transaction_cost"]
+        )
         
         # 计算回测指标
-        if not trades:
+        if returns.size == 0:
             return {"annual_return": 0, "win_rate": 0, "max_drawdown": 0, "trade_count": 0}
         
-        trade_df = pd.DataFrame(trades)
-        total_return = (1 + trade_df["return_rate"]).prod() - 1
-        # 年化收益率（按180天折算）
-        annual_return = (1 + total_return) ** (365 / BACKTEST_CONFIG["history_days"]) - 1
+        cum_return = np.cumprod(1 + returns)
+        # 年化收益率（按180个交易日折算，一年约252个交易日）
+        annual_return = cum_return[-1] ** (252 / BACKTEST_CONFIG["history_days"]) - 1
         # 胜率（盈利交易占比）
-        win_rate = len(trade_df[trade_df["return_rate"] > 0]) / len(trade_df)
+        win_rate = (returns > 0).mean()
         # 最大回撤（累计收益的最大跌幅）
-        trade_df["cum_return"] = (1 + trade_df["return_rate"]).cumprod()
-        trade_df["cum_max"] = trade_df["cum_return"].cummax()
-        trade_df["drawdown"] = (trade_df["cum_return"] - trade_df["cum_max"]) / trade_df["cum_max"]
-        max_drawdown = trade_df["drawdown"].min()
+        cum_max = np.maximum.accumulate(cum_return)
+        max_drawdown = ((cum_return - cum_max) / cum_max).min()
         
         return {
             "annual_return": annual_return,
             "win_rate": win_rate,
             "max_drawdown": max_drawdown,
-            "trade_count": len(trade_df)
+            "trade_count": returns.size
         }
     except Exception as e:
-        print(f"❌ {stock_code} 回测失败：{str(e)}")
+        print(f"❌ {arrays['code']} 回测失败：{str(e)}")
+        return None
+
+METRIC_KEYS = ("annual_return", "win_rate", "max_drawdown", "trade_count")
+
+def _is_sane_combo(params):
+    """结构性剪枝：短期均线至少比长期均线短2天，否则金叉/死叉信号没有意义"""
+    return params["MA_SHORT"] + 2 <= params["MA_LONG"]
+
+def _combo_score(metrics):
+    """综合评分（风险调整后收益）"""
+    weights = BACKTEST_CONFIG["score_weights"]
+    return (
+        metrics["annual_return"] * weights["annual_return"] +
+        metrics["win_rate"] * weights["win_rate"] +
+        metrics["max_drawdown"] * weights["max_drawdown"]
+    )
+
+def _screen_combo(combo, param_names, arrays):
+    """预筛：只回测一只股票，返回其指标（结构无效或交易不足2次时返回None）"""
+    params = dict(zip(param_names, combo))
+    if not _is_sane_combo(params):
         return None
+    metrics = backtest_strategy(arrays, params)
+    if metrics and metrics["trade_count"] >= 2:
+        return metrics
+    return None
 
-def optimize_strategy_params(top5_stocks):
-    """增强参数优化：用3只股票交叉验证，提升参数稳定性"""
+def _evaluate_combo(combo, param_names, test_arrays, known_metrics=()):
+    """回测单组参数：返回(参数, 平均指标, 综合评分)，有效股票不足时返回None（known_metrics为预筛已回测的有效指标）"""
+    params = dict(zip(param_names, combo))
+    if not _is_sane_combo(params):
+        return None
+    stock_metrics = list(known_metrics)
+    
+    for arrays in test_arrays:
+        metrics = backtest_strategy(arrays, params)
+        if metrics and metrics["trade_count"] >= 2:  # 至少2次交易才有效
+            stock_metrics.append(metrics)
+    
+    if len(stock_metrics) < 2:  # 至少2只股票有效才计算
+        return None
+    
+    # 计算平均指标（各股票指标按行堆叠，一次按列求均值）
+    metric_matrix = np.array([[m[k] for k in METRIC_KEYS] for m in stock_metrics], dtype=np.float64)
+    avg_annual_return, avg_win_rate, avg_max_drawdown, avg_trade_count = metric_matrix.mean(axis=0)
+    avg_metrics = {
+        "annual_return": avg_annual_return,
+        "win_rate": avg_win_rate,
+        "max_drawdown": avg_max_drawdown,
+        "trade_count": avg_trade_count
+    }
+    
+    return params, avg_metrics, _combo_score(avg_metrics)
+
+def _sample_combos(n_samples, rng):
+    """从参数网格中无放回随机抽取n_samples组参数"""
+    values = list(PARAM_SEARCH_CONFIG.values())
+    shape = [len(v) for v in values]
+    total = prod(shape)
+    flat_idx = rng.choice(total, size=min(n_samples, total), replace=False)
+    grid_idx = np.unravel_index(flat_idx, shape)
+    return [tuple(v[i] for v, i in zip(values, idx)) for idx in zip(*grid_idx)]
+
+def _neighbor_combos(center):
+    """最优组合在网格上±1档范围内的全部参数组合"""
+    ranges = []
+    for v, c in zip(PARAM_SEARCH_CONFIG.values(), center):
+        i = v.index(c)
+        ranges.append(v[max(i - 1, 0):i + 2])
+    return list(product(*ranges))
+
+def _bayes_search(param_names, test_arrays):
+    """optuna TPE贝叶斯优化：按历史回测结果引导采样，少量回测逼近最优参数"""
+    import optuna  # 仅bayes模式需要，按需导入
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    
+    valid_results = []
+    
+    def objective(trial):
+        combo = []
+        for name in param_names:
+            values = PARAM_SEARCH_CONFIG[name]
+            if all(isinstance(v, int) for v in values):
+                combo.append(trial.suggest_int(name, min(values), max(values)))
+            else:
+                combo.append(trial.suggest_float(name, min(values), max(values)))
+        result = _evaluate_combo(tuple(combo), param_names, test_arrays)
+        if result is None:  # 有效股票不足，不参与建模
+            raise optuna.TrialPruned()
+        valid_results.append(result)
+        return result[2]
+    
+    sampler = optuna.samplers.TPESampler(
+        n_startup_trials=SEARCH_CONFIG["bayes_startup"], seed=SEARCH_CONFIG["seed"]
+    )
+    study = optuna.create_study(direction="maximize", sampler=sampler)
+    study.optimize(objective, n_trials=SEARCH_CONFIG["bayes_trials"], show_progress_bar=True)
+    return valid_results
+
+def _parallel_map(fn, tasks, total, desc, n_jobs):
+    """多进程执行fn(*args)（任务之间互不依赖），结果按任务顺序返回"""
+    return Parallel(
+        n_jobs=n_jobs, prefer="processes",
+        batch_size=SEARCH_CONFIG["batch_size"], max_nbytes=SEARCH_CONFIG["max_nbytes"]
+    )(
+        delayed(fn)(*args) for args in _progress(tasks, total=total, desc=desc)
+    )
+
+def _run_combos(combos, total, desc, param_names, test_arrays, n_jobs):
+    """并行回测一批参数组合，返回有效结果列表（开启预筛时先用第一只股票淘汰明显较差的组合）"""
+    if total * len(test_arrays) < SEARCH_CONFIG["parallel_min_backtests"]:
+        n_jobs = 1  # 回测量小，串行执行，不启动进程池
+    if n_jobs != 1:
+        _warmup_backtest_kernel()  # 只有多进程时才需要（串行回测使用只读数组，编译的是另一种签名）
+    quantile = SEARCH_CONFIG["screen_quantile"]
+    if quantile <= 0 or len(test_arrays) < 2:
+        tasks = ((combo, param_names, test_arrays) for combo in combos)
+        results = _parallel_map(_evaluate_combo, tasks, total, desc, n_jobs)
+        return [r for r in results if r is not None]
+    
+    # 第一轮：只回测第一只股票
+    combos = list(combos)
+    tasks = ((combo, param_names, test_arrays[0]) for combo in combos)
+    first_metrics = _parallel_map(_screen_combo, tasks, total, f"{desc}（预筛）", n_jobs)
+    
+    # 淘汰第一只股票评分低于分位数的组合（第一只股票无效的组合无法判断，予以保留）
+    scores = np.array([np.nan if m is None else _combo_score(m) for m in first_metrics])
+    threshold = np.nanquantile(scores, quantile) if not np.isnan(scores).all() else -np.inf
+    keep = [i for i, score in enumerate(scores) if not score < threshold]
+    
+    # 第二轮：保留的组合回测其余股票，与第一只股票的指标合并
+    tasks = (
+        (combos[i], param_names, test_arrays[1:], () if first_metrics[i] is None else (first_metrics[i],))
+        for i in keep
+    )
+    results = _parallel_map(_evaluate_combo, tasks, len(keep), desc, n_jobs)
+    return [r for r in results if r is not None]
+
+def optimize_strategy_params(top5_stocks, n_jobs=-1):
+    """增强参数优化：用3只股票交叉验证，提升参数稳定性（回测量达到parallel_min_backtests时按n_jobs多进程回测，-1=全部CPU核心）"""
     print("\n⚙️  正在优化策略参数...（精准模式）")
-    from itertools import product
     
     param_names = list(PARAM_SEARCH_CONFIG.keys())
-    param_combinations = product(*PARAM_SEARCH_CONFIG.values())
-    total_combinations = len(list(product(*PARAM_SEARCH_CONFIG.values())))
-    print(f"参数组合总数：{total_combinations}，正在回测...")
+    total_combinations = prod(len(v) for v in PARAM_SEARCH_CONFIG.values())
+    search_mode = SEARCH_CONFIG["mode"]
+    rng = np.random.default_rng(SEARCH_CONFIG["seed"])
     
-    best_score = -float("inf")
     best_params = {
         "MA_SHORT": 5,
         "MA_LONG": 20,
@@ -337,69 +670,103 @@ def optimize_strategy_params(top5_stocks):
         "BUY_MARGIN": 0.01,
         "SELL_MARGIN": 0.01
     }
-    all_results = []
     
-    # 用前3只股票交叉验证（提升参数通用性）
-    test_stocks = top5_stocks.head(3)
-    
-    for combo in tqdm(param_combinations, total=total_combinations, desc="参数回测"):
-        params = dict(zip(param_names, combo))
-        stock_metrics = []
-        
-        for _, row in test_stocks.iterrows():
-            metrics = backtest_strategy(row["code"], params)
-            if metrics and metrics["trade_count"] >= 2:  # 至少2次交易才有效
-                stock_metrics.append(metrics)
-        
-        if len(stock_metrics) < 2:  # 至少2只股票有效才计算
+    # 用前3只股票交叉验证（提升参数通用性），行情只下载预处理一次
+    test_arrays = []
+    for code in top5_stocks.head(3)["code"]:
+        try:
+            arrays = _prep_backtest_arrays(code)
+        except Exception as e:
+            print(f"❌ {code} 回测数据获取失败：{str(e)}")
             continue
-        
-        # 计算平均指标
-        avg_annual_return = np.mean([m["annual_return"] for m in stock_metrics])
-        avg_win_rate = np.mean([m["win_rate"] for m in stock_metrics])
-        avg_max_drawdown = np.mean([m["max_drawdown"] for m in stock_metrics])
-        
-        # 综合评分（风险调整后收益）
-        score = (
-            avg_annual_return * BACKTEST_CONFIG["score_weights"]["annual_return"] +
-            avg_win_rate * BACKTEST_CONFIG["score_weights"]["win_rate"] +
-            avg_max_drawdown * BACKTEST_CONFIG["score_weights"]["max_drawdown"]
+        if arrays is not None:
+            test_arrays.append(arrays)
+    
+    if search_mode == "grid":
+        print(f"参数组合总数：{total_combinations}，正在回测...")
+        valid_results = _run_combos(
+            product(*PARAM_SEARCH_CONFIG.values()), total_combinations, "参数回测",
+            param_names, test_arrays, n_jobs
         )
-        
-        all_results.append({
-            **params,
-            "annual_return": avg_annual_return,
-            "win_rate": avg_win_rate,
-            "max_drawdown": avg_max_drawdown,
-            "trade_count": np.mean([m["trade_count"] for m in stock_metrics]),
-            "综合评分": score
-        })
-        
-        # 更新最优参数
-        if score > best_score:
-            best_score = score
-            best_params = params.copy()
+    elif search_mode == "random":
+        combos = _sample_combos(SEARCH_CONFIG["random_samples"], rng)
+        print(f"随机搜索：从{total_combinations}组参数中抽样{len(combos)}组，正在回测...")
+        valid_results = _run_combos(combos, len(combos), "参数回测", param_names, test_arrays, n_jobs)
+    elif search_mode == "coarse2fine":
+        combos = _sample_combos(SEARCH_CONFIG["coarse_samples"], rng)
+        print(f"粗搜：从{total_combinations}组参数中抽样{len(combos)}组，正在回测...")
+        valid_results = _run_combos(combos, len(combos), "粗搜回测", param_names, test_arrays, n_jobs)
+        if valid_results:
+            # 在粗搜最优组合的邻域内细搜（跳过已回测的组合）
+            center = tuple(max(valid_results, key=lambda r: r[2])[0].values())
+            tested = set(combos)
+            fine_combos = [c for c in _neighbor_combos(center) if c not in tested]
+            print(f"细搜：最优组合邻域内{len(fine_combos)}组参数，正在回测...")
+            valid_results += _run_combos(
+                fine_combos, len(fine_combos), "细搜回测", param_names, test_arrays, n_jobs
+            )
+    elif search_mode == "bayes":
+        print(f"贝叶斯优化：回测{SEARCH_CONFIG['bayes_trials']}组参数（网格共{total_combinations}组）...")
+        valid_results = _bayes_search(param_names, test_arrays)
+    else:
+        raise ValueError(f"未知的参数搜索方式：{search_mode}（可选grid/random/coarse2fine/bayes）")
+    
+    all_results = [
+        {**params, **avg_metrics, "综合评分": score}
+        for params, avg_metrics, score in valid_results
+    ]
+    
+    # 确定最优参数
+    best_score = -float("inf")
+    best_metrics = None
+    if valid_results:
+        params, best_metrics, best_score = max(valid_results, key=lambda r: r[2])
+        best_params = params.copy()
     
     # 保存参数优化日志
     if all_results:
+        today = datetime.now().strftime("%Y-%m-%d")
         result_df = pd.DataFrame(all_results)
-        result_df["优化日期"] = datetime.now().strftime("%Y-%m-%d")
+        result_df["优化日期"] = today
         result_df = result_df.sort_values("综合评分", ascending=False).head(10)  # 保存前10组最优参数
-        result_df.to_csv(PARAM_LOG_PATH, mode="a", header=not os.path.exists(PARAM_LOG_PATH), index=False)
+        table = pa.Table.from_pandas(result_df, preserve_index=False)
+        pq.write_to_dataset(table, root_path=PARAM_LOG_PATH, partition_cols=["优化日期"], compression="zstd")
+        _record_optimized_date(today)
     
     # 输出最优参数及性能
     print(f"\n✨ 最优参数组合（综合评分：{best_score:.4f}）：")
     for k, v in best_params.items():
         print(f"  {k}: {v}")
-    if all_results:
-        top_result = all_results[0]
+    if best_metrics:
         print(f"\n📊 最优参数性能：")
-        print(f"  平均年化收益率：{top_result['annual_return']:.2%}")
-        print(f"  平均胜率：{top_result['win_rate']:.2%}")
-        print(f"  平均最大回撤：{top_result['max_drawdown']:.2%}")
-        print(f"  平均交易次数：{top_result['trade_count']:.1f}次")
+        print(f"  平均年化收益率：{best_metrics['annual_return']:.2%}")
+        print(f"  平均胜率：{best_metrics['win_rate']:.2%}")
+        print(f"  平均最大回撤：{best_metrics['max_drawdown']:.2%}")
+        print(f"  平均交易次数：{best_metrics['trade_count']:.1f}次")
     return best_params
 
+def get_optimized_dates():
+    """读取已优化日期；进度文件不存在时从参数日志的分区目录（优化日期=YYYY-MM-DD）和旧版CSV日志恢复"""
+    if os.path.exists(PROGRESS_PATH):
+        with open(PROGRESS_PATH, encoding="utf-8") as f:
+            return json.load(f)["dates"]
+    dates = set()
+    if os.path.exists(PARAM_LOG_PATH):
+        files = pq.ParquetDataset(PARAM_LOG_PATH).files
+        dates |= {os.path.basename(os.path.dirname(f)).split("=", 1)[1] for f in files}
+    if os.path.exists(LEGACY_PARAM_LOG_PATH):
+        legacy_df = pd.read_csv(LEGACY_PARAM_LOG_PATH, usecols=["优化日期"], dtype=str)
+        dates |= set(legacy_df["优化日期"].dropna())
+    return sorted(dates)
+
+def _record_optimized_date(date):
+    """把优化日期加入进度文件（先写临时文件再替换，避免中断时写坏）"""
+    dates = sorted(set(get_optimized_dates()) | {date})
+    tmp_path = PROGRESS_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"dates": dates}, f, ensure_ascii=False)
+    os.replace(tmp_path, PROGRESS_PATH)
+
 def generate_trading_signals(top5_stocks, best_params):
     """增强信号生成：增加资金管理，输出更详细的交易建议"""
     print("\n📈 当日交易信号（TOP5股票）：")
@@ -408,54 +775,67 @@ def generate_trading_signals(top5_stocks, best_params):
     invest_ratio = 0.7     # 70%资金用于投资（留30%风险准备金）
     total_invest = initial_cash * invest_ratio
     per_stock_cash = total_invest / OUTPUT_CONFIG["signal_stock_count"]  # 平均分配资金
+    ma_short_days = best_params["MA_SHORT"]
+    ma_long_days = best_params["MA_LONG"]
+    sr_days = best_params["SUPPORT_RESIST_DAYS"]
     
-    for idx, row in top5_stocks.iterrows():
+    # 取各股票最近30天数据（计算均线+支撑位），按行堆叠为(股票数, 30)矩阵，不足30天的头部补NaN
+    window = 30
+    closes = np.full((len(top5_stocks), window), np.nan)
+    lows = closes.copy()
+    highs = closes.copy()
+    load_errors = {}
+    for i, code in enumerate(top5_stocks["code"]):
         try:
-            # 获取30天数据（计算均线+支撑位）
-            df = ak.stock_zh_a_hist(
-                symbol=row["code"],
-                period="daily",
-                adjust="qfq"
-            ).tail(30).reset_index(drop=True)
-            
-            df = df.fillna(method="ffill").fillna(method="bfill")
-            df["ma_short"] = df["收盘"].rolling(window=best_params["MA_SHORT"], min_periods=1).mean()
-            df["ma_long"] = df["收盘"].rolling(window=best_params["MA_LONG"], min_periods=1).mean()
-            df["support"] = df["最低"].rolling(window=best_params["SUPPORT_RESIST_DAYS"], min_periods=1).min()
-            df["resistance"] = df["最高"].rolling(window=best_params["SUPPORT_RESIST_DAYS"], min_periods=1).max()
-            
-            latest = df.iloc[-1]
-            prev_latest = df.iloc[-2] if len(df) >= 2 else latest
-            
-            # 精准信号判断
-            buy_signal = (
-                latest["ma_short"] > latest["ma_long"] and
-                prev_latest["ma_short"] <= prev_latest["ma_long"] and  # 金叉信号
-                latest["收盘"] <= df["support"].iloc[-1] * (1 + best_params["BUY_MARGIN"]) and  # 靠近支撑位
-                latest["收盘"] > df["support"].iloc[-1] * 0.95 and  # 不跌破支撑位
-                latest["ma_short"] > 0 and latest["ma_long"] > 0
-            )
-            sell_signal = (
-                latest["ma_short"] < latest["ma_long"] and
-                prev_latest["ma_short"] >= prev_latest["ma_long"] and  # 死叉信号
-                latest["收盘"] < df["support"].iloc[-1] * 0.985  # 跌破支撑位止损
-            )
-            hold_signal = (
-                latest["ma_short"] > latest["ma_long"] and
-                not buy_signal and not sell_signal
-            )
+            arrays = _tail(load_prepped(code), window)
+        except Exception as e:
+            load_errors[i] = e
+            continue
+        n = len(arrays["close"])
+        if n == 0:
+            load_errors[i] = ValueError("行情数据为空")
+            continue
+        closes[i, window - n:] = arrays["close"]
+        lows[i, window - n:] = arrays["low"]
+        highs[i, window - n:] = arrays["high"]
+    
+    # 所有股票一次性计算指标：信号只依赖最近两日，直接取末尾窗口（[前一日, 最新一日]）
+    ma_short = np.stack([
+        np.nanmean(closes[:, -ma_short_days - 1:-1], axis=1), np.nanmean(closes[:, -ma_short_days:], axis=1)
+    ], axis=1)
+    ma_long = np.stack([
+        np.nanmean(closes[:, -ma_long_days - 1:-1], axis=1), np.nanmean(closes[:, -ma_long_days:], axis=1)
+    ], axis=1)
+    supports = np.nanmin(lows[:, -sr_days:], axis=1)
+    resistances = np.nanmax(highs[:, -sr_days:], axis=1)
+    
+    # 精准信号判断（与回测使用同一套信号规则：金叉靠近支撑位买入，死叉卖出）
+    buy_arr, sell_arr = _signal_arrays(
+        closes[:, -2:], ma_short, ma_long, supports[:, None], best_params["BUY_MARGIN"]
+    )
+    buy_signals = buy_arr[:, -1]
+    sell_signals = sell_arr[:, -1]
+    hold_signals = (ma_short[:, -1] > ma_long[:, -1]) & ~buy_signals & ~sell_signals
+    
+    for i, (idx, row) in enumerate(top5_stocks.iterrows()):
+        try:
+            if i in load_errors:
+                raise load_errors[i]
+            latest_close = closes[i, -1]
+            support = supports[i]
+            resistance = resistances[i]
             
-            if buy_signal:
+            if buy_signals[i]:
                 signal = "买入"
-                buy_amount = int(per_stock_cash // latest["收盘"])  # 整数股
-                actual_invest = buy_amount * latest["收盘"]
+                buy_amount = int(per_stock_cash // latest_close)  # 整数股
+                actual_invest = buy_amount * latest_close
                 remaining_cash = per_stock_cash - actual_invest
-            elif sell_signal:
+            elif sell_signals[i]:
                 signal = "卖出"
                 buy_amount = 0
                 actual_invest = 0
                 remaining_cash = per_stock_cash
-            elif hold_signal:
+            elif hold_signals[i]:
                 signal = "持有"
                 buy_amount = 0
                 actual_invest = 0
@@ -467,18 +847,18 @@ def generate_trading_signals(top5_stocks, best_params):
                 remaining_cash = per_stock_cash
             
             # 止损价和目标价建议
-            stop_loss_price = round(df["support"].iloc[-1] * 0.985, 2)
-            target_price = round(df["resistance"].iloc[-1] * 1.02, 2)  # 2%盈利目标
+            stop_loss_price = round(support * 0.985, 2)
+            target_price = round(resistance * 1.02, 2)  # 2%盈利目标
             
             trading_signals.append({
                 "日期": datetime.now().strftime("%Y-%m-%d"),
                 "股票代码": row["code"],
                 "股票名称": row["name"],
-                "最新价": round(float(latest["收盘"]), 2),
-                f"{best_params['MA_SHORT']}日均线": round(float(latest["ma_short"]), 2),
-                f"{best_params['MA_LONG']}日均线": round(float(latest["ma_long"]), 2),
-                "支撑位": round(float(df["support"].iloc[-1]), 2),
-                "阻力位": round(float(df["resistance"].iloc[-1]), 2),
+                "最新价": round(float(latest_close), 2),
+                f"{best_params['MA_SHORT']}日均线": round(float(ma_short[i, -1]), 2),
+                f"{best_params['MA_LONG']}日均线": round(float(ma_long[i, -1]), 2),
+                "支撑位": round(float(support), 2),
+                "阻力位": round(float(resistance), 2),
                 "交易信号": signal,
                 "建议购买数量": buy_amount,
                 "单只股票分配资金": round(per_stock_cash, 2),
@@ -490,8 +870,8 @@ def generate_trading_signals(top5_stocks, best_params):
             
             # 输出详细信息
             print(f"\n{idx+1}. {row['code']} {row['name']}")
-            print(f"   基础信息：最新价{latest['收盘']:.2f}元 | 支撑位{df['support'].iloc[-1]:.2f}元 | 阻力位{df['resistance'].iloc[-1]:.2f}元")
-            print(f"   均线状态：{best_params['MA_SHORT']}日({latest['ma_short']:.2f}) | {best_params['MA_LONG']}日({latest['ma_long']:.2f})")
+            print(f"   基础信息：最新价{latest_close:.2f}元 | 支撑位{support:.2f}元 | 阻力位{resistance:.2f}元")
+            print(f"   均线状态：{best_params['MA_SHORT']}日({ma_short[i, -1]:.2f}) | {best_params['MA_LONG']}日({ma_long[i, -1]:.2f})")
             print(f"   交易信号：{signal}")
             if signal == "买入":
                 print(f"   资金分配：{per_stock_cash:.2f}元 | 购买数量：{buy_amount}股 | 预计成本：{actual_invest:.2f}元")
@@ -499,7 +879,7 @@ def generate_trading_signals(top5_stocks, best_params):
             elif signal == "持有":
                 print(f"   操作建议：继续持有 | 止损价{stop_loss_price:.2f}元 | 目标价{target_price:.2f}元")
             elif signal == "卖出":
-                print(f"   操作建议：立即卖出（跌破止损位）")
+                print(f"   操作建议：立即卖出（短期均线下穿长期均线，死叉卖出）")
             else:
                 print(f"   操作建议：等待信号明确")
         except Exception as e:
@@ -507,8 +887,8 @@ def generate_trading_signals(top5_stocks, best_params):
             continue
     
     # 保存信号日志
-    signal_df = pd.DataFrame(trading_signals)
-    signal_df.to_csv(SIGNAL_LOG_PATH, mode="a", header=not os.path.exists(SIGNAL_LOG_PATH), index=False)
+    if trading_signals:
+        _append_csv(SIGNAL_LOG_PATH, trading_signals, list(trading_signals[0].keys()))
     
     # 输出资金汇总
     total_actual_invest = sum([s["预计持仓成本"] for s in trading_signals])
@@ -534,9 +914,9 @@ if __name__ == "__main__":
         generate_trading_signals(top5_stocks, best_params)
         
         # 月度进度提示
-        total_days = len(pd.read_csv(PARAM_LOG_PATH)["优化日期"].unique()) if os.path.exists(PARAM_LOG_PATH) else 0
+        total_days = len(get_optimized_dates())
         print(f"\n📊 月度优化进度：{total_days}/30 天")
-        print(f"💡 策略说明：基于180天回溯数据优化，筛选5只高潜力股票，含资金管理和风险控制")
+        print(f"💡 策略说明：基于180个交易日（约9个月）回溯数据优化，筛选5只高潜力股票，含资金管理和风险控制")
         
     except Exception as e:
         print(f"\n❌ 程序执行错误：{str(e)}")
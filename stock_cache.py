@@ -0,0 +1,112 @@
+# stock_cache.py
+import os
+import time
+import shutil
+import hashlib
+from datetime import datetime
+import pandas as pd
+import akshare as ak
+
+CACHE_DIR = os.path.join("strategy_log", ".cache")  # 与运行日志放在同一目录
+HIST_CACHE_DIR = os.path.join(CACHE_DIR, "hist")
+META_CACHE_DIR = os.path.join(CACHE_DIR, "meta")
+
+# TTL单位（秒），支持"1d"/"6h"/"30m"/"600s"或直接传秒数
+_TTL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# 日线缓存按交易日失效：收盘后写入的缓存当天有效；盘中写入的缓存（当日K线未定）只在盘中短时间内有效
+MARKET_CLOSE = (15, 0)   # A股收盘时间
+INTRADAY_TTL = "10m"     # 盘中缓存有效期（与实时行情缓存一致）
+
+# 日线行情以float32缓存（价格/成交量精度足够，缓存体积和读取量减半）
+_FLOAT32_COLS = ["开盘", "收盘", "最高", "最低", "成交量"]
+
+
+def _ttl_seconds(ttl):
+    """把TTL配置统一转换为秒数"""
+    if isinstance(ttl, str):
+        return float(ttl[:-1]) * _TTL_UNITS[ttl[-1]]
+    return float(ttl)
+
+
+def _is_fresh(path, ttl):
+    """缓存文件存在且未过期"""
+    return os.path.exists(path) and time.time() - os.path.getmtime(path) < _ttl_seconds(ttl)
+
+
+def _is_fresh_bars(path, ttl):
+    """
+    日线缓存是否可用：ttl只作为上限，另外要求缓存是今天写入的；
+    收盘前写入的缓存到收盘后即过期，盘中最多复用INTRADAY_TTL
+    """
+    if not _is_fresh(path, ttl):
+        return False
+    now = datetime.now()
+    cached_at = datetime.fromtimestamp(os.path.getmtime(path))
+    if cached_at.date() != now.date():
+        return False
+    close_time = now.replace(hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1], second=0, microsecond=0)
+    if cached_at >= close_time:
+        return True
+    return now < close_time and _is_fresh(path, INTRADAY_TTL)
+
+
+def _write_cache(df, path):
+    """先写临时文件再替换，避免中断时留下写了一半却仍被视为未过期的缓存"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def _compact_hist(df):
+    """日期转为datetime64，OHLCV转为float32（只处理存在的列，兼容不同AKShare版本的列名）"""
+    if "日期" in df.columns:
+        df["日期"] = pd.to_datetime(df["日期"])
+    return df.astype({col: "float32" for col in _FLOAT32_COLS if col in df.columns})
+
+
+def get_hist(code, start=None, end=None, adjust="qfq", ttl="1d"):
+    """
+    带本地Parquet缓存的日线行情（替代ak.stock_zh_a_hist）
+    同一(代码, 起止日期, 复权方式)在同一交易日内只请求一次接口（规则见_is_fresh_bars）
+    """
+    key = hashlib.md5(f"{code}|{start}|{end}|{adjust}".encode("utf-8")).hexdigest()
+    cache_dir = os.path.join(HIST_CACHE_DIR, code)
+    path = os.path.join(cache_dir, f"{key}.parquet")
+    if _is_fresh_bars(path, ttl):
+        return pd.read_parquet(path)
+
+    # 未传起止日期时使用接口默认值（全部历史数据）
+    kwargs = {"symbol": code, "period": "daily", "adjust": adjust}
+    if start is not None:
+        kwargs["start_date"] = start
+    if end is not None:
+        kwargs["end_date"] = end
+    df = ak.stock_zh_a_hist(**kwargs)
+
+    # 空数据不落盘，避免接口偶发异常被缓存一整天
+    if not df.empty:
+        df = _compact_hist(df)
+        _write_cache(df, path)
+    return df
+
+
+def cached_call(name, fn, ttl=3600):
+    """
+    带本地Parquet缓存的无参接口调用（如股票列表、实时行情）
+    TTL内直接读取缓存，默认1小时过期
+    """
+    path = os.path.join(META_CACHE_DIR, f"{name}.parquet")
+    if _is_fresh(path, ttl):
+        return pd.read_parquet(path)
+
+    df = fn()
+    if not df.empty:
+        _write_cache(df, path)
+    return df
+
+
+def clear():
+    """清空本地行情缓存"""
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
@@ -1,6 +1,8 @@
 # trading_signal.py
+import numpy as np
 import pandas as pd
 import akshare as ak  # 核心数据源
+from stock_cache import get_hist  # 日线行情本地缓存（与auto_strategy_optimizer.py共用）
 from config import (
     TARGET_SYMBOL, TARGET_STOCK_NAME,
     MA_SHORT, MA_LONG, SUPPORT_RESIST_DAYS,
@@ -17,11 +19,11 @@ def generate_signal():
     
     try:
         # 调用AKShare接口（去掉日期参数，用默认值，避免格式错误）
-        # 接口：stock_zh_a_hist（东方财富），默认返回最近100条日线
-        df = ak.stock_zh_a_hist(
-            symbol=TARGET_SYMBOL,
-            period="daily",          # 日线参数（固定'daily'）
-            adjust="qfq" if AUTO_ADJUST else "none"  # 前复权
+        # 接口：stock_zh_a_hist（东方财富），经本地缓存读取；实时分析最多复用10分钟内的缓存
+        df = get_hist(
+            TARGET_SYMBOL,
+            adjust="qfq" if AUTO_ADJUST else "none",  # 前复权
+            ttl="10m"
         )
 
         # 数据验证（确保接口返回有效数据）
@@ -44,9 +46,9 @@ def generate_signal():
             raise ValueError(f"有效数据{len(df)}条 < 20条，接口异常")
         
         # 提取关键数据
-        latest_data = df.iloc[-1]
-        latest_close = round(float(latest_data["收盘"]), 2)
-        latest_date = latest_data["日期"].strftime("%Y-%m-%d")
+        close = df["收盘"].to_numpy(np.float64)
+        latest_close = round(float(close[-1]), 2)
+        latest_date = df["日期"].iat[-1].strftime("%Y-%m-%d")
         
         print(f"   ✅ 数据获取成功！")
         print(f"   📊 最新交易日：{latest_date}，最新收盘价：{latest_close}元")
@@ -68,9 +70,9 @@ def generate_signal():
             # 处理备用接口数据
             df["日期"] = pd.to_datetime(df["日期"])
             df = df.sort_values("日期").reset_index(drop=True)
-            latest_data = df.iloc[-1]
-            latest_close = round(float(latest_data["收盘"]), 2)
-            latest_date = latest_data["日期"].strftime("%Y-%m-%d")
+            close = df["收盘"].to_numpy(np.float64)
+            latest_close = round(float(close[-1]), 2)
+            latest_date = df["日期"].iat[-1].strftime("%Y-%m-%d")
             
             print(f"   ✅ 备用接口数据获取成功！")
             print(f"   📊 最新交易日：{latest_date}，最新收盘价：{latest_close}元")
@@ -94,21 +96,18 @@ def generate_signal():
             )
 
     # ====================== 核心指标计算（极简逻辑）======================
-    # 计算均线
-    df["ma_short"] = df["收盘"].rolling(window=MA_SHORT, min_periods=1).mean()
-    df["ma_long"] = df["收盘"].rolling(window=MA_LONG, min_periods=1).mean()
+    # 计算均线（只需最新一日的值，直接对末尾窗口求均值，不生成整列）
+    short_ma = round(float(np.nanmean(close[-MA_SHORT:])), 2)
+    long_ma = round(float(np.nanmean(close[-MA_LONG:])), 2)
     
-    # 提取关键指标
-    short_ma = round(float(df.iloc[-1]["ma_short"]), 2)
-    long_ma = round(float(df.iloc[-1]["ma_long"]), 2)
-    prev_close = round(float(df.iloc[-2]["收盘"]), 2) if len(df) >= 2 else latest_close
+    # 提取关键指标（直接对NumPy数组取值，避免逐行构造Series）
+    prev_close = round(float(close[-2]), 2) if len(close) >= 2 else latest_close
     limit_up = round(prev_close * (1 + LIMIT_UP_DOWN), 2)
     limit_down = round(prev_close * (1 - LIMIT_UP_DOWN), 2)
     
     # 近N日高低点
-    recent_df = df.tail(SUPPORT_RESIST_DAYS)
-    recent_low = round(float(recent_df["最低"].min()), 2)
-    recent_high = round(float(recent_df["最高"].max()), 2)
+    recent_low = round(float(df["最低"].to_numpy(np.float64)[-SUPPORT_RESIST_DAYS:].min()), 2)
+    recent_high = round(float(df["最高"].to_numpy(np.float64)[-SUPPORT_RESIST_DAYS:].max()), 2)
     
     # 买入/卖出区间
     buy_low = max(round(recent_low * (1 - BUY_MARGIN), 2), limit_down)